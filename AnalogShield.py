@@ -32,7 +32,7 @@ Example use::
     >>> a.ramp_on(0) # Ramp on DAC 0
     >>> a.ramp_amplitude(0, 3.3) # Set the amplitude of the ramp to 3.3V
     >>> a.analog_read(2, 3) # Take 3 samples of ADC 2
-    [0.32415, 0.314525, 0.328846]
+    array([0.32415 , 0.314525, 0.328846])
     >>> a.analog_write(3, -2) # Set DAC 3 to -2V
 
 All the code to control the Analog Shield is wrapped in the class
@@ -43,7 +43,7 @@ ADCs and DACs) and PySerial (to communicate with the Arduino).
 Any method that requires a channel expects it to be either an integer
 or the string C{"all"}. Unless otherwise specified, C{"all"} applies
 the method to all channels. In places where there is no reasonable
-behaviour for all channels (e.g. reading ADC), C{"all"} is not a valid
+behaviour for all channels (e.g. calibration), C{"all"} is not a valid
 value for the channel. This will be noted in the documentation for
 that method.
 """
@@ -51,102 +51,212 @@ that method.
 from __future__ import print_function, division
 
 import os.path # For saving ADC and DAC calibration
-import pickle # For reading and saving calibration to a file
+import struct # For encoding command arguments
 import sys # Determine what version of Python is running
 import time
 import warnings
 
-import numpy as np # For calculating means and standard deviations
+import numpy as np # For calculating means and standard deviations, and saving calibration
 import serial # For communicating with the Arduino
 
 class AnalogShield(object):
-    def __init__(self, address, calibration_location=None):
+    RAMP_ALL_CHANNELS = 4 # Ramp channel number that selects every channel at once
+    PIPELINE_DEPTH = 15 # Commands that fit in the Arduino's serial receive buffer (63 usable bytes)
+
+    # Ramp shapes, in the order of their numbers in the serial protocol
+    RAMP_FUNCTIONS = ("triangle", "sin", "square")
+
+    # Layout of the ramp settings stored for each channel
+    RAMP_DTYPE = [
+        ("on", "?"),
+        ("period", "u4"), # Milliseconds
+        ("amplitude", "f8"), # Volts
+        ("offset", "f8"), # Volts
+        ("phase", "f8"), # Percent of the period
+        ("function", "u1") # Index into RAMP_FUNCTIONS
+    ]
+
+    # Commands that set each DAC and sample each ADC, by channel
+    DAC_COMMANDS = {0: "v0", 1: "v1", 2: "v2", 3: "v3", "all": "va"}
+    ADC_COMMANDS = {0: "A0", 1: "A1", 2: "A2", 3: "A3", "all": "AA"}
+
+    # Value of each ASCII character as a hex digit, for
+    # parse_samples(). Characters that aren't hex digits are NaN.
+    HEX_DIGITS = np.full(256, np.nan)
+    HEX_DIGITS[np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)] = np.arange(16)
+    HEX_DIGITS[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+
+    def __init__(self, address, calibration_location=None, timeout=None):
         """
         address: the serial port of the shield.
 
         calibration_location: if provided, DAC and ADC calibration
         will be loaded from and saved to this file.
+
+        timeout: if provided, the number of seconds to wait for a
+        response before giving up. By default, wait indefinitely
+        (commands in queue mode don't respond until triggered).
         """
 
-        self.device = serial.Serial(port=address, baudrate=2e6, timeout=0)
+        self.device = serial.Serial(port=address, baudrate=2e6, timeout=timeout)
         time.sleep(3) # Ensure the first bytes of serial communication aren't dropped
 
-        self.ramp = {
-            "on": [False] * 4,
-            "period": [100] * 4,
-            "amplitude": [5] * 4,
-            "offset": [0] * 4,
-            "phase": [0]*4,
-            "function": ["triangle"] * 4
-        }
-
-        # Error correction functions - do nothing by default
+        # Ramp settings, one record per channel. The function is
+        # stored as its index in RAMP_FUNCTIONS.
+        self.ramp = np.zeros(4, dtype=AnalogShield.RAMP_DTYPE)
+        self.ramp["on"] = False
+        self.ramp["period"] = 100
+        self.ramp["amplitude"] = 5
+        self.ramp["offset"] = 0
+        self.ramp["phase"] = 0
+        self.ramp["function"] = AnalogShield.RAMP_FUNCTIONS.index("triangle")
+
+        # Error correction lines, stored as polynomial coefficients
+        # in increasing order, i.e. (intercept, slope) - do
+        # nothing by default
         self.adc_correct = [None] * 4
         self.dac_correct = [None] * 4
 
+        # Uncalibrated channels that have already been warned about,
+        # as ("adc", channel) or ("dac", channel)
+        self.uncalibrated_warnings = set()
+
+        # Number of responses to commands sent with wait=False that
+        # are still waiting to be read from the serial port
+        self.unread_responses = 0
+
         # If provided, load the calibration from a file
         self.calibration_location = calibration_location
         if self.calibration_location is not None and os.path.exists(calibration_location):
-            with open(self.calibration_location, "rb") as calibration_file:
-                calibration = pickle.load(calibration_file)
-
-                self.adc_correct = calibration["adc"]
-                self.dac_correct = calibration["dac"]
-
-        # Reset to known default state
-        self.queue_off()
-        self.ramp_off("all")
-        self.ramp_period("all", 100)
-        self.ramp_amplitude("all", 5)
-        self.ramp_offset("all", 0)
-        self.ramp_phase("all", 0)
-        self.ramp_function("all", "triangle")
-
-        self.analog_write("all", 0)
+            try:
+                with np.load(self.calibration_location) as calibration:
+                    # Uncalibrated channels are stored as NaN
+                    self.adc_correct = [None if np.isnan(line).any() else tuple(line) for line in calibration["adc"]]
+                    self.dac_correct = [None if np.isnan(line).any() else tuple(line) for line in calibration["dac"]]
+            except ValueError: # np.load refuses to unpickle the files older versions saved
+                warnings.warn("Calibration file {} is not in NumPy format and was ignored. Recalibrate to replace it.".format(calibration_location), RuntimeWarning, stacklevel=2)
+
+        # Reset to known default state, matching the ramp settings
+        # above. All the commands are sent in a single batch, and the
+        # acknowledgements are read along with the next response.
+        self.write_many([
+            ("qm", 0), # Queue mode off
+            ("rc", AnalogShield.RAMP_ALL_CHANNELS),
+            ("r0", 0), # Ramp off
+            ("rp", 100), # Period: 100ms
+            ("ra", AnalogShield.volts_to_bits(5)), # Amplitude: 5V
+            ("ro", AnalogShield.volts_to_bits(0)), # Offset: 0V
+            ("rs", 0), # Phase shift: none
+            ("rf", 0), # Function: triangle
+            ("va", AnalogShield.volts_to_bits(0)) # All DACs to 0V
+        ], wait=False)
+        self.ramp_channel = AnalogShield.RAMP_ALL_CHANNELS # Ramp channel currently selected on the Arduino
 
         # For some reason, the first three readings of the ADC
         # channels are sometimes 0x0000, 0x0000, 0x00**. After that,
         # reading acts normally. This is a temporary fix to swallow
         # those three strange values until a better solution is found.
-        for channel in range(4):
-            self.analog_read(channel, 5)
+        # The samples are discarded, so they are read from all the
+        # channels at once without waiting for them.
+        self.write("aa", 3, wait=False)
 
-    def write(self, identifier, arg=0):
+    def write(self, identifier, arg=0, decode=True, wait=True):
         """
         Write a command to the Analog Shield and return the response.
 
         The identifier is a two-character string (case-insensitive).
         The argument to the command must be an 16-bit unsigned integer
         (i.e. 0 <= arg <= 0xffff).  If the argument is omitted, two
-        null bytes will be sent.
+        null bytes will be sent. If decode is False, the response is
+        returned as raw bytes instead of a string.
+
+        If wait is False, the command is sent without waiting for its
+        response and None is returned. The response is read and
+        discarded before the next command that does wait.
+        """
+
+        # Don't let unread commands overflow the Arduino's receive buffer
+        if self.unread_responses >= AnalogShield.PIPELINE_DEPTH:
+            self.discard_responses()
+
+        self.device.write(AnalogShield.encode_command(identifier, arg))
+        self.unread_responses += 1 # Until its response has been read
+
+        if wait:
+            self.discard_responses(keep=1) # Responses to earlier commands arrive first
+            self.unread_responses -= 1
+            return self.read_response(decode)
+
+    def write_many(self, commands, decode=True, wait=True):
         """
+        Write several commands to the Analog Shield and return a list
+        of their responses.
+
+        commands is a sequence of (identifier, arg) pairs, as would be
+        passed to write(). Instead of waiting for each response before
+        sending the next command, the commands are sent back to back
+        and the responses are read afterwards, so a batch costs a
+        single round trip. The Arduino's serial receive buffer holds
+        63 bytes, so the commands are sent PIPELINE_DEPTH at a time.
+
+        If wait is False, none of the responses are read and an empty
+        list is returned, as with write().
+        """
+
+        responses = []
+        for start in range(0, len(commands), AnalogShield.PIPELINE_DEPTH):
+            batch = commands[start:start + AnalogShield.PIPELINE_DEPTH]
+
+            # Don't let unread commands overflow the Arduino's receive buffer
+            if self.unread_responses + len(batch) > AnalogShield.PIPELINE_DEPTH:
+                self.discard_responses()
+
+            self.device.write(b"".join(AnalogShield.encode_command(identifier, arg) for identifier, arg in batch))
+            self.unread_responses += len(batch) # Until their responses have been read
 
-        ## Write the command
-        # Convert the command into a series of bytes
-        byte_list = bytearray([ord(char) for char in identifier])
-        byte_list.extend(AnalogShield.encode_num(arg))
+            if wait:
+                self.discard_responses(keep=len(batch)) # Responses to earlier commands arrive first
+                for command in batch:
+                    self.unread_responses -= 1
+                    responses.append(self.read_response(decode))
 
-        self.device.write(byte_list)
+        return responses
+
+    def discard_responses(self, keep=0):
+        """
+        Read and discard the responses to commands that were sent
+        without being waited for, leaving the responses to the last
+        keep commands unread.
+        """
+
+        while self.unread_responses > keep:
+            # Count the response as read first, since read_response
+            # counts it again if it doesn't arrive
+            self.unread_responses -= 1
+            self.read_response(decode=False)
+
+    def read_response(self, decode=True):
+        """
+        Read the response to a single command, stripping the
+        terminating semicolon.
+        """
 
-        ## Read the response
         # The response to a command is always terminated by a
-        # semicolon, so keep polling the input buffer until we read
-        # one.
-        response = self.device.read()
-        while True: # Keep reading until we break out of the loop
-            response += self.device.read()
-
-            if len(response) > 0:
-                 # In Python 2 slicing bytes results in str, but in
-                 # Python 3 it gives an int. We therefore need to
-                 # check both cases to version-independently determine
-                 # if the character we just read is a semicolon. 0x3b
-                 # is ASCII semicolon.
-                if response[-1] == ";" or response[-1] == 0x3b:
-                    break
+        # semicolon, so block in PySerial until one arrives. If the
+        # timeout runs out first (or the wait is interrupted, e.g. by
+        # Ctrl-C), the response will be incomplete. The rest of it
+        # will still arrive, so count it as unread to keep later
+        # responses matched with their commands.
+        try:
+            response = self.device.read_until(b";")
+            if not response.endswith(b";"):
+                raise serial.SerialTimeoutException("No response from the Analog Shield within {}s".format(self.device.timeout))
+        except BaseException:
+            self.unread_responses += 1
+            raise
 
         # If Python 3 (or later), convert to a Unicode string
-        if sys.version_info.major >= 3:
+        if decode and sys.version_info.major >= 3:
             response = response.decode("latin-1")
 
         return response[:-1] # Strip the semicolon
@@ -163,42 +273,40 @@ class AnalogShield(object):
         voltage() that returns a number.
         """
 
+        # Check before the sweep, which takes several seconds
+        if channel not in range(4):
+            raise ValueError("Invalid channel: {}".format(channel))
+
         actual_readings = []
         adc_readings = []
 
+        # The multimeter measures the actual voltage, so DAC 0 doesn't
+        # need to be corrected
+
         # A big jump in DAC output occurs going to -5V, so give the multimeter extra time to adjust
-        self.analog_write(0, -5)
+        self.analog_write(0, -5, correct=False, wait=False)
         time.sleep(2)
         for v_out in range(-5, 6): # Go from -5 to 5V in 1V steps
-            self.analog_write(0, v_out)
+            # Set the DAC and sample the ADC in a single round
+            # trip. The DAC settles far faster than the multimeter,
+            # so the ADC doesn't need to wait for the delay below.
+            adc_response = self.write_many([("v0", AnalogShield.volts_to_bits(v_out)), (AnalogShield.ADC_COMMANDS[channel], 500)], decode=False)[-1]
 
             # Collect data
             time.sleep(0.01) # Delay to let the multimeter adjust
             v_actual = multimeter.voltage()
-            v_adc = np.mean(self.analog_read(channel, 500, correct=False)) # Average 500 readings to reduce noise
+            v_adc = np.mean(AnalogShield.parse_samples(adc_response)) # Average 500 readings to reduce noise
 
             # Save data
             actual_readings.append(v_actual)
             adc_readings.append(v_adc)
 
         # Calculate a linear regression that fits the error data
-        self.adc_correct[channel] = np.poly1d(np.polyfit(adc_readings, actual_readings, 1))
+        self.adc_correct[channel] = tuple(np.polynomial.polynomial.polyfit(adc_readings, actual_readings, 1)) # (intercept, slope)
+        self.uncalibrated_warnings.discard(("adc", channel))
 
         # If a calibration file was given, save the updated calibration
-        if self.calibration_location is not None:
-            # Read the existing calibrations, if the file exists
-            if os.path.exists(self.calibration_location):
-                with open(self.calibration_location, "rb") as calibration_file:
-                    calibration = pickle.load(calibration_file)
-
-            else:
-                calibration = {"adc": self.adc_correct, "dac": self.dac_correct}
-
-            # Update the calibration
-            calibration["adc"][channel] = self.dac_correct[channel]
-
-            with open(self.calibration_location, "wb") as calibration_file:
-                pickle.dump(calibration, calibration_file, protocol=2) # Use a Python 2--compatible protocol
+        self.save_calibration()
 
     def dac_calibrate(self, channel, multimeter):
         """
@@ -211,11 +319,15 @@ class AnalogShield(object):
         voltage() that returns a number.
         """
 
+        # Check before the sweep, which takes several seconds
+        if channel not in range(4):
+            raise ValueError("Invalid channel: {}".format(channel))
+
         input_v = [v for v in range(-5, 6)]
         dac_output = []
 
         # A big jump in DAC output occurs going to -5V, so give the multimeter extra time to adjust
-        self.analog_write(channel, -5, correct=False)
+        self.analog_write(channel, -5, correct=False, wait=False)
         time.sleep(2)
         for v_out in input_v: # Go from -5 to 5V in 1V steps
             self.analog_write(channel, v_out, correct=False)
@@ -228,52 +340,86 @@ class AnalogShield(object):
             dac_output.append(v_actual)
 
         # Calculate a linear regression that fits the error data
-        self.dac_correct[channel] = np.poly1d(np.polyfit(dac_output, input_v, 1))
+        self.dac_correct[channel] = tuple(np.polynomial.polynomial.polyfit(dac_output, input_v, 1)) # (intercept, slope)
+        self.uncalibrated_warnings.discard(("dac", channel))
 
         # If a calibration file was given, save the updated calibration
-        if self.calibration_location is not None:
-            # Read the existing calibrations, if the file exists
-            if os.path.exists(self.calibration_location):
-                with open(self.calibration_location, "rb") as calibration_file:
-                    calibration = pickle.load(calibration_file)
+        self.save_calibration()
 
-            else:
-                calibration = {"adc": self.adc_correct, "dac": self.dac_correct}
-
-            # Update the calibration
-            calibration["dac"][channel] = self.dac_correct[channel]
+    def save_calibration(self):
+        """
+        Save the current DAC and ADC calibrations to the calibration
+        file. Does nothing if no calibration file was given.
+        """
 
+        if self.calibration_location is not None:
+            # The correction tables in memory are already up to date
+            # (they were loaded from the file, if it existed), so they
+            # can be written out as they are without reading the file.
+            # Each table is saved as a 4x2 array of (intercept, slope),
+            # with NaN for uncalibrated channels.
+            adc = [line if line is not None else (np.nan, np.nan) for line in self.adc_correct]
+            dac = [line if line is not None else (np.nan, np.nan) for line in self.dac_correct]
+
+            # Write through a file object, otherwise np.savez adds .npz
+            # to the end of the file name
             with open(self.calibration_location, "wb") as calibration_file:
-                pickle.dump(calibration, calibration_file, protocol=2) # Use a Python 2--compatible protocol
+                np.savez(calibration_file, adc=adc, dac=dac)
 
     # Ramp methods
-    def ramp_running(self, channel):
+    def ramp_set(self, channel, setting, value, identifier, arg):
+        """
+        Store a ramp setting and send the command that applies it to
+        the shield. If the channel is "all", every channel is selected
+        at once so that the setting takes a single command instead of
+        one per channel. The channel is only selected if it isn't
+        already.
+        """
+
         if channel == "all":
-            return all(self.ramp["on"])
+            self.ramp[setting][:] = value
+            channel_num = AnalogShield.RAMP_ALL_CHANNELS
         else:
-            return self.ramp["on"][channel]
+            self.ramp[setting][channel] = value
+            channel_num = channel
+
+        # The Arduino remembers the selected channel, so only select
+        # it if it has changed. If it has, select it and apply the
+        # setting in one round trip.
+        if channel_num == self.ramp_channel:
+            return self.write(identifier, arg)
+        else:
+            # If the response never arrives (e.g. on a timeout), it's
+            # unknown whether the Arduino switched channels, so don't
+            # trust the old one
+            self.ramp_channel = None
+            response = self.write_many([("rc", channel_num), (identifier, arg)])[-1]
+            self.ramp_channel = channel_num
+            return response
+
+    def ramp_get(self, channel, setting):
+        """
+        Return the current value of a ramp setting. If the channel is
+        "all", return a list of the values on every channel.
+        """
 
-    def ramp_on(self, channel):
+        # Convert from NumPy types to plain Python values
         if channel == "all":
-            responses = []
-            for c in range(4):
-                responses.append(self.ramp_on(c))
-            return responses
-
-        self.ramp["on"][channel] = True
-        self.write("rc", channel)
-        return self.write("r1")
+            return self.ramp[setting].tolist()
+        else:
+            return self.ramp[setting][channel].item()
 
-    def ramp_off(self, channel):
+    def ramp_running(self, channel):
         if channel == "all":
-            responses = []
-            for c in range(4):
-                responses.append(self.ramp_off(c))
-            return responses
+            return bool(self.ramp["on"].all())
+        else:
+            return self.ramp_get(channel, "on")
 
-        self.ramp["on"][channel] = False
-        self.write("rc", channel)
-        return self.write("r0")
+    def ramp_on(self, channel):
+        return self.ramp_set(channel, "on", True, "r1", 0)
+
+    def ramp_off(self, channel):
+        return self.ramp_set(channel, "on", False, "r0", 0)
 
     def ramp_period(self, channel, time=None):
         """
@@ -281,18 +427,10 @@ class AnalogShield(object):
         return the current value.
         """
 
-        if channel == "all":
-            responses = []
-            for c in range(4):
-                responses.append(self.ramp_period(c, time))
-            return responses
-
         if time is None:
-            return self.ramp["period"][channel]
+            return self.ramp_get(channel, "period")
         elif time > 0:
-            self.ramp["period"][channel] = time
-            self.write("rc", channel)
-            return self.write("rp", time)
+            return self.ramp_set(channel, "period", time, "rp", time)
         else:
             raise ValueError("Period must be positive.")
 
@@ -303,20 +441,11 @@ class AnalogShield(object):
         value.
         """
 
-        if channel == "all":
-            responses = []
-            for c in range(4):
-                responses.append(self.ramp_amplitude(c, amp))
-            return responses
-
         if amp is None:
-            return self.ramp["amplitude"][channel]
+            return self.ramp_get(channel, "amplitude")
         elif 0 <= amp <= 5:
-            self.ramp["amplitude"][channel] = amp
             amp_bits = AnalogShield.volts_to_bits(amp)
-
-            self.write("rc", channel)
-            return self.write("ra", amp_bits)
+            return self.ramp_set(channel, "amplitude", amp, "ra", amp_bits)
         else:
             raise ValueError("Amplitude must be between 0V and 5V.")
 
@@ -326,20 +455,11 @@ class AnalogShield(object):
         Without an argument, return the current value.
         """
 
-        if channel == "all":
-            responses = []
-            for c in range(4):
-                responses.append(self.ramp_offset(c, offset))
-            return responses
-
         if offset is None:
-            return self.ramp["offset"][channel]
+            return self.ramp_get(channel, "offset")
         elif -5 <= offset <= 5:
-            self.ramp["offset"][channel] = offset
             offset_bits = AnalogShield.volts_to_bits(offset)
-
-            self.write("rc", channel)
-            return self.write("ro", offset_bits)
+            return self.ramp_set(channel, "offset", offset, "ro", offset_bits)
 
     def ramp_phase(self, channel, phase=None):
         """
@@ -347,20 +467,11 @@ class AnalogShield(object):
         the period. Without an argument, return the current value.
         """
 
-        if channel == "all":
-            responses = []
-            for c in range(4):
-                responses.append(self.ramp_phase(c, phase))
-            return responses
-
         if phase is None:
-            return self.ramp["phase"][channel]
+            return self.ramp_get(channel, "phase")
         elif 0 <= phase <= 100:
-            self.ramp["phase"][channel] = phase
             phase_bits = int(phase * 65535/100) # Convert from percent to bits
-
-            self.write("rc", channel)
-            return self.write("rs", phase_bits)
+            return self.ramp_set(channel, "phase", phase, "rs", phase_bits)
 
     def ramp_function(self, channel, function=None):
         """
@@ -369,71 +480,83 @@ class AnalogShield(object):
         triangle, sin, and square.
         """
 
-        if channel == "all":
-            responses = []
-            for c in range(4):
-                responses.append(self.ramp_function(c, function))
-            return responses
-
         if function is None:
-            return self.ramp["function"][channel]
-        elif function in ("triangle", "sin", "square"):
-            self.ramp["function"][channel] = function
-            func_num = {"triangle":0, "sin":1, "square":2}[function]
-
-            self.write("rc", channel)
-            return self.write("rf", func_num)
+            func_nums = self.ramp_get(channel, "function")
+            if channel == "all":
+                return [AnalogShield.RAMP_FUNCTIONS[func_num] for func_num in func_nums]
+            else:
+                return AnalogShield.RAMP_FUNCTIONS[func_nums]
+        elif function in AnalogShield.RAMP_FUNCTIONS:
+            func_num = AnalogShield.RAMP_FUNCTIONS.index(function)
+            return self.ramp_set(channel, "function", func_num, "rf", func_num)
         else:
             raise ValueError("Invalid ramp function: {}".format(function))
 
     # DAC methods
-    def analog_write(self, channel, val, correct=True):
-        """Set the value on one of the DACs."""
+    def analog_write(self, channel, val, correct=True, wait=True):
+        """
+        Set the value on one of the DACs. If wait is False, don't wait
+        for the Arduino to acknowledge the command.
+        """
+
+        if channel not in AnalogShield.DAC_COMMANDS:
+            raise ValueError("Invalid channel: {}".format(channel))
 
         # Apply correction function, if desired
         if correct and channel != "all":
             if self.dac_correct[channel] is not None:
-                val = self.dac_correct[channel](val)
+                intercept, slope = self.dac_correct[channel]
+                val = val*slope + intercept
 
                 # Make sure the corrected value stays within range
                 val = max(-5, val)
                 val = min(5, val)
-            else:
+            elif ("dac", channel) not in self.uncalibrated_warnings: # Only warn once per channel
                 warnings.warn("DAC channel {} is not yet calibrated.".format(channel), RuntimeWarning, stacklevel=2)
+                self.uncalibrated_warnings.add(("dac", channel))
 
-        val_bits = AnalogShield.volts_to_bits(val)
-        if channel == "all":
-            return self.write("va", val_bits)
-        elif 0 <= channel <= 3:
-            return self.write("v"+str(channel), val_bits)
+        return self.write(AnalogShield.DAC_COMMANDS[channel], AnalogShield.volts_to_bits(val), wait=wait)
 
     # ADC methods
     def analog_read(self, channel, samples=1, correct=True):
         """
         Read one or more values off of the ADC.
 
-        This method returns an array of voltages.  The samples are
-        taken as fast as possible, without a regular delay.
+        This method returns a NumPy array of voltages.  The samples
+        are taken as fast as possible, without a regular delay. If the
+        channel is "all", every channel is sampled in a single command
+        and the result is a 4 x samples array with one row per
+        channel.
         """
 
-        if 0 <= channel <= 3:
-            # Extract values from the response
-            response = self.write("A"+str(channel), samples)
-            bit_vals = (int(x, 16) for x in response.split(","))
+        if channel not in AnalogShield.ADC_COMMANDS:
+            raise ValueError("Invalid channel: {}".format(channel))
+
+        channels = range(4) if channel == "all" else [channel]
 
-            # Convert to volts
-            voltages = [AnalogShield.bits_to_volts(b) for b in bit_vals]
+        # Extract values from the response and convert to volts
+        response = self.write(AnalogShield.ADC_COMMANDS[channel], samples, decode=False)
+        voltages = AnalogShield.parse_samples(response)
 
-            # Apply correction function, if desired
-            if correct:
-                if self.adc_correct[channel] is not None:
-                    voltages = [self.adc_correct[channel](v) for v in voltages]
-                else:
-                    warnings.warn("ADC channel {} is not yet calibrated.".format(channel), RuntimeWarning, stacklevel=2)
+        # The samples of each channel are interleaved, so give each
+        # channel its own row
+        rows = voltages.reshape(samples, len(channels)).T
 
-            return voltages
+        # Apply correction function, if desired
+        if correct:
+            for c, row in zip(channels, rows):
+                if self.adc_correct[c] is not None:
+                    intercept, slope = self.adc_correct[c]
+                    row *= slope
+                    row += intercept
+                elif ("adc", c) not in self.uncalibrated_warnings: # Only warn once per channel
+                    warnings.warn("ADC channel {} is not yet calibrated.".format(c), RuntimeWarning, stacklevel=2)
+                    self.uncalibrated_warnings.add(("adc", c))
+
+        if channel == "all":
+            return rows
         else:
-            raise ValueError("Invalid channel: {}".format(channel))
+            return voltages
 
     # Queue methods
     def queue_on(self):
@@ -442,6 +565,35 @@ class AnalogShield(object):
     def queue_off(self):
         return self.write('qm', 0)
 
+    @staticmethod
+    def parse_samples(response):
+        """
+        Convert the raw response to an ADC read into an array of
+        voltages.
+
+        Every sample is sent as four hex digits followed by a comma,
+        so the response can be viewed as a table with one row per
+        sample without splitting it. Looking each character up in
+        HEX_DIGITS and weighting the columns by their place value then
+        gives all the samples at once.
+
+        Raises ValueError if the response isn't in that format, e.g. if
+        it is an error message.
+        """
+
+        samples = (len(response) + 1) // 5
+        if (len(response) + 1) % 5 != 0 or response[4::5] != b"," * (samples - 1):
+            raise ValueError("Malformed ADC response: {!r}".format(response))
+
+        digits = np.ndarray((samples, 4), dtype=np.uint8, buffer=response, strides=(5, 1))
+        bits = AnalogShield.HEX_DIGITS[digits].dot([0x1000, 0x100, 0x10, 0x1])
+
+        # Any character that isn't a hex digit makes its sample NaN
+        if np.isnan(bits).any():
+            raise ValueError("Malformed ADC response: {!r}".format(response))
+
+        return AnalogShield.bits_to_volts(bits)
+
     @staticmethod
     def bits_to_volts(bits):
         """Convert a voltage as encoded by the Analog Shield into volts."""
@@ -454,11 +606,20 @@ class AnalogShield(object):
 
         return int((13107*volts + 65535)/2)
 
+    @staticmethod
+    def encode_command(identifier, arg):
+        """
+        Convert a command into the four bytes sent to the Analog
+        Shield: the two characters of the identifier followed by the
+        argument, MSB first.
+        """
+
+        return identifier.encode("ascii") + AnalogShield.encode_num(arg)
+
     @staticmethod
     def encode_num(n):
         """
-        Convert a 16-bit number to two separate bytes in MSB, LSB
-        order.
+        Convert a 16-bit number to two bytes in MSB, LSB order.
 
         How it works:
 
@@ -469,6 +630,9 @@ class AnalogShield(object):
 
             - LSB: bitwise AND with 0000 0000 1111 1111, setting the
               leftmost byte to zero
+
+        struct.pack does both in C: ">H" is a big-endian unsigned
+        short.
         """
 
-        return [n >> 8, n & 0x00ff]
+        return struct.pack(">H", n)
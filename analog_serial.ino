@@ -11,6 +11,7 @@ int queue_pin = 7;
 unsigned int dac[4];
 
 // Ramp default settings
+const int RAMP_ALL_CHANNELS = 4; // Selecting this channel applies ramp settings to every channel
 boolean ramp_enabled[4] = {false, false, false, false};
 int ramp_channel = 0;
 unsigned int ramp_period[4] = {100 * 1e3, 100 * 1e3, 100 * 1e3, 100 * 1e3}; // Units: microseconds
@@ -19,33 +20,48 @@ unsigned int ramp_offset[4] = {ZERO_V, ZERO_V, ZERO_V, ZERO_V}; // Units volts
 float ramp_phase[4] = {0, 0, 0, 0}; // Units: percent of period
 unsigned int ramp_function[4] = {0, 0, 0, 0};
 
-// Change ramp settings - returns 0 on success, -1 on error
-int ramp_settings(char function, unsigned short arg) {
+// Change a ramp setting on a single channel - returns 0 on success, -1 on error
+int ramp_setting(int channel, char function, unsigned short arg) {
   if (function == '0') { // Ramp off
-    ramp_enabled[ramp_channel] = false;
-    analog.write(ramp_channel, ZERO_V); // Reset the channel
+    ramp_enabled[channel] = false;
+    analog.write(channel, ZERO_V); // Reset the channel
   } else if (function == '1') { // Ramp on
-    ramp_enabled[ramp_channel] = true;
-  } else if (function == 'C' || function == 'c') {
-    if (arg <= 3) { // Check channel
-      ramp_channel = arg;
-    } else { // Invalid channel; return error status
-      return -1;
-    }
+    ramp_enabled[channel] = true;
   } else if (function == 'P' || function == 'p') { // Set period
-    ramp_period[ramp_channel] = arg * 1e3; // Convert milliseconds to microseconds
+    ramp_period[channel] = arg * 1e3; // Convert milliseconds to microseconds
   } else if (function == 'A' || function == 'a') { // Set amplitude
-    ramp_amplitude[ramp_channel] = arg-ZERO_V;
+    ramp_amplitude[channel] = arg-ZERO_V;
   } else if (function == 'O' || function == 'o') { // Set offset
-    ramp_offset[ramp_channel] = arg;
+    ramp_offset[channel] = arg;
   } else if (function == 'S' || function == 's') { // Set phase
-    ramp_phase[ramp_channel] = arg * 1.0/0xffff; // Convert from bits to percentage
+    ramp_phase[channel] = arg * 1.0/0xffff; // Convert from bits to percentage
   } else if (function == 'F' || function == 'f') { // Set function
-    ramp_function[ramp_channel] = arg;
+    ramp_function[channel] = arg;
   } else { // Unrecognized function
     return -1;
   }
 
+  return 0;
+}
+
+// Change ramp settings - returns 0 on success, -1 on error
+int ramp_settings(char function, unsigned short arg) {
+  if (function == 'C' || function == 'c') {
+    if (arg <= RAMP_ALL_CHANNELS) { // Check channel
+      ramp_channel = arg;
+    } else { // Invalid channel; return error status
+      return -1;
+    }
+  } else if (ramp_channel == RAMP_ALL_CHANNELS) { // Apply the setting to every channel
+    for (int i = 0; i < 4; i++) {
+      if (ramp_setting(i, function, arg) != 0) {
+        return -1;
+      }
+    }
+  } else if (ramp_setting(ramp_channel, function, arg) != 0) {
+    return -1;
+  }
+
   Serial.print("OK");
   return 0; // Return success status
 }
@@ -86,12 +102,29 @@ int set_dac(char channel, unsigned short val) {
   return 0;
 }
 
+// Print an ADC reading as four hex digits
+void print_reading(unsigned short reading) {
+  // Pad with zeros so that every sample has the same width
+  for (unsigned short digit = 0x1000; digit > 1 && reading < digit; digit >>= 4) {
+    Serial.print('0');
+  }
+  Serial.print(reading, HEX);
+}
+
 int get_adc(char channel, unsigned short arg) {
-  if ('0' <= channel && channel <= '3') {
+  if (channel == 'A' || channel == 'a') { // Read every channel, interleaving the samples
     for (int i = 0; i < arg; i++) {
-      unsigned short reading = analog.read(channel-'0');
+      for (int c = 0; c < 4; c++) {
+        print_reading(analog.read(c));
 
-      Serial.print(reading, HEX);
+        if (i != arg-1 || c != 3) { // Print separator if this isn't the last value
+          Serial.print(',');
+        }
+      }
+    }
+  } else if ('0' <= channel && channel <= '3') {
+    for (int i = 0; i < arg; i++) {
+      print_reading(analog.read(channel-'0'));
 
       if (i != arg-1) { // Print separator if this isn't the last value
         Serial.print(',');
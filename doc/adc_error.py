@@ -1,36 +1,40 @@
 import AnalogShield as AS
+from concurrent.futures import ThreadPoolExecutor
 import matplotlib.pyplot as plt
 import numpy as np
-import operator
 import RigolInstruments as RI
 import time
 
 a = AS.AnalogShield("/dev/analog_shield", "D784216")
 
-a.adc_calibrate(0, "/dev/multimeter")
-
 # Connect to the multimeter
 multimeter = RI.DM3058("/dev/multimeter")
 
-actual_readings = []
-adc_readings = []
+v_outs = range(-5, 6) # Go from -5 to 5V in 1V steps
+actual_readings = np.empty(len(v_outs))
+adc_readings = np.empty(len(v_outs))
 
 # A big jump in DAC output occurs going to -5V, so give the multimeter extra time to adjust
 a.analog_write(0, -5)
 time.sleep(2)
-for v_out in range(-5, 6): # Go from -5 to 5V in 1V steps
-    a.analog_write(0, v_out)
+with ThreadPoolExecutor(max_workers=1) as executor:
+    for i, v_out in enumerate(v_outs):
+        a.analog_write(0, v_out)
+
+        # Collect data
+        time.sleep(0.01) # Delay to let the multimeter adjust
+
+        # The two instruments are independent, so read the multimeter
+        # in the background while the ADC is sampled
+        v_actual = executor.submit(multimeter.voltage)
 
-    # Collect data
-    time.sleep(0.01) # Delay to let the multimeter adjust
-    v_actual = multimeter.voltage()
-    v_adc = np.mean(a.analog_read(0, 500, correct=False)) # Average 500 readings to reduce noise
+        v_adc = np.mean(a.analog_read(0, 500, correct=False)) # Average 500 readings to reduce noise
 
-    # Save data
-    actual_readings.append(v_actual)
-    adc_readings.append(v_adc)
+        # Save data
+        actual_readings[i] = v_actual.result()
+        adc_readings[i] = v_adc
 
-error = map(operator.sub, adc_readings, actual_readings)
+error = adc_readings - actual_readings
 
 plt.plot(actual_readings, error, ".")
 plt.title("ADC error - without calibration")